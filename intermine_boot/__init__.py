@@ -3,17 +3,18 @@ import sys
 import re
 import os
 import click
-from xdg import (XDG_DATA_HOME)
-from intermine_boot import commands
+from xdg import (XDG_DATA_HOME, XDG_CACHE_HOME)
+from intermine_boot import workspace
+from intermine_boot.archive import COMPONENTS
 import pathlib
-import pkg_resources
+from importlib import metadata
 
-MODE_OPTIONS = ['start', 'stop', 'build', 'load', 'clean']
+MODE_OPTIONS = ['start', 'stop', 'build', 'load', 'clean', 'prefetch', 'clone', 'daemon', 'bench', 'inspect', 'verify']
 TARGET_OPTIONS = ['local']
 
 
 @click.command()
-@click.version_option(pkg_resources.require('intermine_boot')[0].version)
+@click.version_option(metadata.version('intermine_boot'))
 @click.argument('mode', type=click.Choice(MODE_OPTIONS, case_sensitive=False))
 @click.argument('target', type=click.Choice(TARGET_OPTIONS, case_sensitive=False))
 @click.argument('source', type=click.Path(exists=True), required=False)
@@ -25,6 +26,18 @@ TARGET_OPTIONS = ['local']
 @click.option('--bio-version', help='Use a specific version of InterMine\'s bio packages. Has no effect when used with `--build-im`, in which case the built version will be used.')
 @click.option('--build-images', is_flag=True, default=False, help='Build Docker images locally instead of using prebuilt images from Docker Hub.')
 @click.option('--rebuild', is_flag=True, default=False, help='Rebuild your mine from scratch even if it already exists.')
+@click.option('--workspace', help='Use a named mine workspace with its own data instead of the default one.')
+@click.option('--clone-from', help='Name of the workspace to clone from in `clone` mode. Defaults to the default workspace.')
+@click.option('--only', multiple=True, type=click.Choice(COMPONENTS), help='Only restore (in `load`) or verify (in `verify`) this component of the archive. Can be given multiple times. `config` is the mine\'s properties and source.')
+@click.option('--warmup/--no-warmup', default=True, help='Warm up the mine by replaying webservice queries before reporting it as ready in `start` and `load`.')
+@click.option('--warmup-config', type=click.Path(exists=True), help='YAML file with the queries to replay during warm-up and whether to run pg_prewarm. See intermine_boot/warmup.py for the format.')
+@click.option('--concurrency', default=8, type=int, help='Number of concurrent clients in `bench` mode.')
+@click.option('--requests', default=500, type=int, help='Number of requests to send in `bench` mode.')
+@click.option('--bench-config', type=click.Path(exists=True), help='YAML file with the mix of queries for `bench` mode. See intermine_boot/bench.py for the format.')
+@click.option('--bench-output', default='intermine_boot-bench.json', type=click.Path(), help='File to write the JSON report of `bench` mode to.')
+@click.option('--daemon-port', default=9990, type=int, help='Port of the local intermine_boot daemon. `start` and `build` are run by the daemon if it is listening on this port.')
+@click.option('--offline', is_flag=True, default=False, help='Resolve dependencies only from the shared dependency cache. Use `prefetch` beforehand to populate it.')
+@click.option('--cache-size', default=4096, type=int, help='Maximum size in MB of the shared dependency cache. Least recently used artifacts are evicted beyond this.')
 def cli(**options):
     """Spin up containers for building and running an InterMine server.
 
@@ -36,20 +49,37 @@ stop - Stop and remove any running containers used to build and run an InterMine
 
 build - Start containers for building an InterMine using SOURCE. Once finished, the containers will be removed and an archive will be created from the built mine. Defaults to Biotestmine if SOURCE is not specified, and will reuse data from a previously built mine if identical.
 
-load - Start containers to run a previously built InterMine saved to an archive SOURCE. The server will continue running until stopped.
+load - Start containers to run a previously built InterMine saved to an archive SOURCE. The server will continue running until stopped. Use --only to restore selected components into the existing data instead of replacing all of it.
 
-clean - Remove all local data saved by this tool.
+clean - Remove all local data saved by this tool for the workspace. The shared dependency cache is kept, but trimmed to --cache-size.
+
+prefetch - Download all dependencies of the mine at SOURCE into the shared dependency cache without building it. Defaults to Biotestmine if SOURCE is not specified.
+
+clone - Create the workspace given by --workspace from an existing, stopped workspace (--clone-from) using reflinks or hardlinks where possible, so a built mine can be forked without copying or rebuilding it.
+
+daemon - Run a local daemon serving the build endpoints of openapi.json on --daemon-port. Builds are queued and run one at a time, reusing the Docker connection and pulled images. While it is running, `start` and `build` are handed over to it.
+
+bench - Load test the running mine with a mix of template queries, path queries, searches and list requests, and write throughput, latency percentiles and container resource usage to --bench-output.
+
+inspect - Show the manifest of the archive SOURCE: mine name, versions, images and the size of each component, without extracting it.
+
+verify - Check the files in the archive SOURCE against the checksums in its manifest, in parallel.
 
 Targets:
 
 local - Use the local docker daemon as host for the containers.
     """
 
-    data_dir = XDG_DATA_HOME / 'intermine_boot'
+    data_dir = workspace.get_data_dir(XDG_DATA_HOME, options['workspace'])
     env = {
+        'data_home': XDG_DATA_HOME,
         'data_dir': data_dir,
+        'cache_dir': XDG_CACHE_HOME / 'intermine_boot',
         'cwd': pathlib.Path.cwd()
     }
 
+    # Imported here so that --version and --help don't pay for it.
+    from intermine_boot import commands
+
     # options and env specify the invocation state and should not be mutated!
     commands.invoke(options['mode'], options, env)
@@ -1,9 +1,11 @@
-import boto3
-from git import Repo,cmd
-from botocore.exceptions import ClientError
 import os
 import click
 import shutil
+import json
+import hashlib
+import zipfile
+import datetime
+from concurrent.futures import ThreadPoolExecutor
 
 def _get_aws_env_vars_or_exit():
     try:
@@ -18,6 +20,8 @@ def _get_aws_env_vars_or_exit():
     return (AWS_ACCESS_KEY, AWS_SECRET_KEY, AWS_BUCKET_NAME)
 
 def lsremote(url):
+    from git import cmd
+
     remote_refs = {}
     g = cmd.Git()
 
@@ -54,6 +58,9 @@ def download_archives(options, env, method):
         raise (NotImplementedError)
 
 def upload_archives_aws(options, env):
+    import boto3
+    from botocore.exceptions import ClientError
+
     (access_key, secret_key, bucket_name) = _get_aws_env_vars_or_exit()
 
     data_path = env['data_dir']
@@ -77,6 +84,9 @@ def upload_archives_aws(options, env):
         click.echo(error, err=True)
 
 def download_archives_aws(options, env):
+    import boto3
+    from botocore.exceptions import ClientError
+
     (access_key, secret_key, bucket_name) = _get_aws_env_vars_or_exit()
 
     data_path = env['data_dir']
@@ -110,3 +120,166 @@ def download_archives_aws(options, env):
     os.remove(str(data_dir / 'postgres.zip'))
     os.remove(str(data_dir / 'solr.zip'))
     os.remove(str(data_dir / 'mine.zip'))
+
+# Archives created by intermine_boot carry a manifest describing their
+# contents, which can be read from the zip's central directory without
+# extracting anything else.
+MANIFEST_NAME = 'intermine_boot-manifest.json'
+MANIFEST_VERSION = 1
+CHUNK_SIZE = 1024 * 1024
+COMPONENTS = ['postgres', 'solr', 'mine', 'config']
+# Manifest fields shown by `inspect`, in order.
+MANIFEST_LABELS = [
+    ('title', 'Title'),
+    ('release_version', 'Release version'),
+    ('im_version', 'InterMine version'),
+    ('bio_version', 'Bio version'),
+    ('im_repo', 'InterMine repository'),
+    ('im_branch', 'InterMine branch'),
+    ('intermine_boot_version', 'intermine_boot version'),
+    ('created', 'Created')
+]
+
+def _get_component_prefixes(mine_name):
+    return {
+        'postgres': ['postgres/'],
+        'solr': ['solr/'],
+        'mine': ['mine/'],
+        'config': ['mine/intermine/', 'mine/' + mine_name + '/']
+    }
+
+def write_archive(archive_path, root_dir, manifest):
+    '''
+    Zips the contents of root_dir into archive_path along with manifest, to
+    which the size and SHA-256 checksum of every file is added.
+    '''
+    files = {}
+    with zipfile.ZipFile(archive_path, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for dirpath, dirnames, filenames in os.walk(root_dir):
+            dirnames.sort()
+            for name in sorted(dirnames) + sorted(filenames):
+                path = os.path.join(dirpath, name)
+                arcname = os.path.relpath(path, root_dir).replace(os.sep, '/')
+                info = zipfile.ZipInfo.from_file(path, arcname)
+                if info.is_dir():
+                    zf.writestr(info, b'')
+                    continue
+
+                info.compress_type = zipfile.ZIP_DEFLATED
+                checksum = hashlib.sha256()
+                size = 0
+                with open(path, 'rb') as src, zf.open(info, 'w') as dst:
+                    for chunk in iter(lambda: src.read(CHUNK_SIZE), b''):
+                        checksum.update(chunk)
+                        dst.write(chunk)
+                        size += len(chunk)
+                files[arcname] = {'size': size, 'sha256': checksum.hexdigest()}
+
+        manifest = dict(manifest)
+        manifest['manifest_version'] = MANIFEST_VERSION
+        manifest['created'] = datetime.datetime.now(datetime.timezone.utc).isoformat()
+        manifest['components'] = _get_component_prefixes(manifest['mine'])
+        manifest['files'] = files
+        zf.writestr(MANIFEST_NAME, json.dumps(manifest, indent=1))
+
+    return archive_path
+
+def read_manifest(archive_path):
+    '''
+    Returns the manifest of an archive, or None if it has none.
+    '''
+    try:
+        with zipfile.ZipFile(archive_path) as zf:
+            return json.loads(zf.read(MANIFEST_NAME).decode('utf-8'))
+    except (KeyError, zipfile.BadZipFile):
+        return None
+
+def read_manifest_or_exit(archive_path):
+    manifest = read_manifest(archive_path)
+    if manifest is None:
+        click.echo(str(archive_path) + ' has no manifest. It was likely created by an older version of intermine_boot.', err=True)
+        exit(1)
+    return manifest
+
+def _get_prefixes(manifest, components):
+    return tuple(prefix for component in components
+                 for prefix in manifest['components'][component])
+
+def get_members(manifest, components=None):
+    '''
+    Returns the paths of the files in the archive belonging to any of
+    components, or all of them if no components are given.
+    '''
+    if not components:
+        return sorted(manifest['files'])
+
+    prefixes = _get_prefixes(manifest, components)
+    return [name for name in sorted(manifest['files']) if name.startswith(prefixes)]
+
+def _verify_members(archive_path, manifest, names):
+    failures = []
+    with zipfile.ZipFile(archive_path) as zf:
+        for name in names:
+            expected = manifest['files'][name]
+            checksum = hashlib.sha256()
+            size = 0
+            try:
+                with zf.open(name) as member:
+                    for chunk in iter(lambda: member.read(CHUNK_SIZE), b''):
+                        checksum.update(chunk)
+                        size += len(chunk)
+            except (KeyError, zipfile.BadZipFile) as e:
+                failures.append((name, str(e)))
+                continue
+            if size != expected['size'] or checksum.hexdigest() != expected['sha256']:
+                failures.append((name, 'checksum mismatch'))
+    return failures
+
+def verify_archive(archive_path, components=None, workers=None):
+    '''
+    Checks the files in an archive against its manifest, in parallel.
+    Returns a list of (path, reason) for every file that failed.
+    '''
+    manifest = read_manifest_or_exit(archive_path)
+    names = get_members(manifest, components)
+    workers = workers or os.cpu_count() or 1
+
+    # Each worker opens the archive on its own, so reads don't contend for
+    # a shared file position.
+    batches = [names[i::workers] for i in range(workers)]
+    with ThreadPoolExecutor(workers) as pool:
+        results = pool.map(lambda batch: _verify_members(archive_path, manifest, batch), batches)
+    return [failure for failures in results for failure in failures]
+
+def extract_archive(archive_path, target_dir, components=None):
+    '''
+    Extracts the given components of an archive, or all of it, into
+    target_dir, restoring file permissions.
+    '''
+    with zipfile.ZipFile(archive_path) as zf:
+        members = [info for info in zf.infolist() if info.filename != MANIFEST_NAME]
+        if components:
+            prefixes = _get_prefixes(read_manifest_or_exit(archive_path), components)
+            members = [info for info in members if info.filename.startswith(prefixes)]
+
+        for info in members:
+            path = zf.extract(info, target_dir)
+            mode = (info.external_attr >> 16) & 0o7777
+            if mode:
+                os.chmod(path, mode)
+
+def format_manifest(manifest):
+    lines = ['Mine: ' + manifest['mine']]
+    for (key, label) in MANIFEST_LABELS:
+        if manifest.get(key):
+            lines.append(label + ': ' + manifest[key])
+
+    for (name, image) in sorted(manifest.get('images', {}).items()):
+        lines.append('Image ' + name + ': ' + ', '.join(image['digests'] or [image['id']]))
+
+    for component in COMPONENTS:
+        names = get_members(manifest, [component])
+        size = sum(manifest['files'][name]['size'] for name in names)
+        lines.append('Component %s: %d files, %.1f MB' % (component, len(names), size / (1024 * 1024)))
+
+    return '\n'.join(lines)
@@ -0,0 +1,201 @@
+"""
+Load test of a running mine's webservice.
+
+Sends --requests requests from --concurrency threads, picked at random from
+a weighted mix of queries, while sampling the CPU and memory usage of the
+containers. Throughput and latency percentiles are written as JSON to
+--bench-output, along with the images and MEM_OPTS of the containers, so that
+runs can be compared.
+
+The mix can be replaced with a YAML (or JSON) file given to --bench-config:
+
+    seed: 0
+    mix:
+      - name: template     # runs one of the mine's templates
+        weight: 4
+        templates: true
+      - name: search
+        weight: 2
+        path: /service/search?q=eve
+      - name: path_query   # POSTs data as a form
+        weight: 3
+        path: /service/query/results
+        data: {query: '<query model="genomic" view="Gene.symbol"/>', format: json}
+"""
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import click
+from intermine_boot import intermine_docker
+from intermine_boot import webservice
+
+CONTAINERS = ['tomcat', 'postgres', 'solr']
+
+PATH_QUERY = ('<query model="genomic" view="Gene.primaryIdentifier Gene.symbol Gene.organism.name" '
+              'sortOrder="Gene.primaryIdentifier asc"></query>')
+
+DEFAULT_CONFIG = {
+    'seed': 0,
+    'mix': [
+        {'name': 'template', 'weight': 4, 'templates': True},
+        {'name': 'path_query', 'weight': 3, 'path': '/service/query/results',
+         'data': {'query': PATH_QUERY, 'format': 'json', 'size': 100}},
+        {'name': 'search', 'weight': 2, 'path': '/service/search?q=gene&size=20'},
+        {'name': 'lists', 'weight': 1, 'path': '/service/lists?format=json'}
+    ]
+}
+
+
+def load_config(path=None):
+    config = dict(DEFAULT_CONFIG)
+    if path:
+        import yaml
+        with open(path) as config_file:
+            config.update(yaml.safe_load(config_file) or {})
+    return config
+
+
+def _plan(mine_url, config, requests):
+    '''
+    Returns the list of (name, path, data) requests to send.
+    '''
+    mix = config['mix']
+    if any(entry.get('templates') for entry in mix):
+        templates = webservice.get_template_names(mine_url)
+        if not templates:
+            click.echo('The mine has no templates, leaving them out of the mix.', err=True)
+            mix = [entry for entry in mix if not entry.get('templates')]
+
+    if not mix:
+        click.echo('The mix of queries to benchmark is empty.', err=True)
+        sys.exit(1)
+
+    rng = random.Random(config['seed'])
+    weights = [entry.get('weight', 1) for entry in mix]
+    plan = []
+    for entry in rng.choices(mix, weights=weights, k=requests):
+        if entry.get('templates'):
+            path = webservice.get_template_path(rng.choice(templates))
+        else:
+            path = entry['path']
+        plan.append((entry['name'], path, entry.get('data')))
+    return plan
+
+
+class _StatsSampler:
+    '''
+    Samples the resource usage of containers in background threads.
+    '''
+    def __init__(self, names):
+        self.samples = {name: [] for name in names}
+        self.stopped = threading.Event()
+
+    def _sample(self, name):
+        try:
+            for sample in intermine_docker.stream_container_stats(name):
+                if self.stopped.is_set():
+                    break
+                self.samples[name].append(sample)
+        except Exception as e:
+            click.echo('Could not collect stats of the %s container: %s' % (name, e), err=True)
+
+    def start(self):
+        for name in self.samples:
+            threading.Thread(target=self._sample, args=(name,), daemon=True).start()
+
+    def stop(self):
+        self.stopped.set()
+
+    def summarize(self):
+        summary = {}
+        for (name, samples) in self.samples.items():
+            if not samples:
+                continue
+            cpu = [cpu_percent for (cpu_percent, _) in samples]
+            memory = [memory_usage / (1024 * 1024) for (_, memory_usage) in samples]
+            summary[name] = {
+                'samples': len(samples),
+                'cpu_percent_mean': round(sum(cpu) / len(cpu), 1),
+                'cpu_percent_max': round(max(cpu), 1),
+                'memory_mb_mean': round(sum(memory) / len(memory), 1),
+                'memory_mb_max': round(max(memory), 1)
+            }
+        return summary
+
+
+def _summarize_results(results):
+    summary = webservice.summarize([seconds for (_, _, seconds) in results])
+    summary['errors'] = sum(1 for (_, status, _) in results if status != 200)
+    return summary
+
+
+def run(options, env):
+    '''
+    Benchmarks the running mine. Returns the report, which is also written to
+    options['bench_output'].
+    '''
+    config = load_config(options['bench_config'])
+    mine_name = intermine_docker._get_mine_name(options, env)
+    mine_url = webservice.get_mine_url(mine_name)
+
+    if options['warmup']:
+        from intermine_boot import warmup
+        if not warmup.run(options, env):
+            return None
+    elif not webservice.wait_until_ready(mine_url):
+        click.echo('The mine at ' + mine_url + ' is not responding.', err=True)
+        return None
+
+    plan = _plan(mine_url, config, options['requests'])
+
+    def execute(planned):
+        (name, path, data) = planned
+        (status, seconds, _) = webservice.request(mine_url + path, data=data)
+        return (name, status, seconds)
+
+    click.echo('Sending %d requests to %s from %d threads...' % (
+        len(plan), mine_url, options['concurrency']))
+
+    sampler = _StatsSampler(CONTAINERS)
+    sampler.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(options['concurrency']) as pool:
+        results = list(pool.map(execute, plan))
+    duration = time.perf_counter() - start
+    sampler.stop()
+
+    by_name = {}
+    for result in results:
+        by_name.setdefault(result[0], []).append(result)
+
+    report = {
+        'mine': mine_name,
+        'url': mine_url,
+        'concurrency': options['concurrency'],
+        'requests': len(results),
+        'duration_s': round(duration, 3),
+        'throughput_rps': round(len(results) / duration, 2) if duration else None,
+        'latency_ms': _summarize_results(results),
+        'by_query': {name: _summarize_results(named) for (name, named) in sorted(by_name.items())},
+        'containers': sampler.summarize(),
+        'images': intermine_docker.get_container_images(CONTAINERS)
+    }
+
+    with open(options['bench_output'], 'w') as output:
+        json.dump(report, output, indent=2)
+
+    latency = report['latency_ms']
+    click.echo('%s requests/s, p50 %s ms, p95 %s ms, p99 %s ms, %d errors' % (
+        report['throughput_rps'], latency['p50'], latency['p95'], latency['p99'],
+        latency['errors']))
+    for (name, stats) in report['containers'].items():
+        click.echo('%s: %s%% CPU (max %s%%), %s MB memory (max %s MB)' % (
+            name, stats['cpu_percent_mean'], stats['cpu_percent_max'],
+            stats['memory_mb_mean'], stats['memory_mb_max']))
+    click.echo('Wrote report to ' + os.path.abspath(options['bench_output']))
+
+    return report
@@ -4,8 +4,12 @@ import re
 import click
 import shutil
 import os
-from intermine_boot import intermine_docker
+import glob
+import zipfile
 from intermine_boot import archive
+from intermine_boot import depcache
+from intermine_boot import workspace
+from intermine_boot import trash
 
 def assert_docker(options, env):
     docker_info = subprocess.run(['docker', 'info'],
@@ -32,6 +36,8 @@ def assert_docker(options, env):
 
 
 def start(options, env):
+    # docker is only imported by the modes that need it to keep startup fast.
+    from intermine_boot import intermine_docker
     assert_docker(options, env)
 
     try:
@@ -41,17 +47,26 @@ def start(options, env):
         raise
 
     if status:
+        if options['warmup']:
+            from intermine_boot import warmup
+            warmup.run(options, env)
+
         # TODO: Once we support building mines other than biotestmine, we should make this text dynamic.
         click.echo('Build completed. Visit http://localhost:9999/biotestmine to access your mine.')
+        depcache.prune(env, options['cache_size'])
     else:
         click.echo('Build unsuccessful. Please check error logs.')
         intermine_docker.down(options, env)
 
+    return status
+
 def stop(options, env):
+    from intermine_boot import intermine_docker
     assert_docker(options, env)
     intermine_docker.down(options, env)
 
 def build(options, env):
+    from intermine_boot import intermine_docker
     assert_docker(options, env)
 
     try:
@@ -62,26 +77,52 @@ def build(options, env):
 
     if status:
         intermine_docker.down(options, env)
-        intermine_docker.create_archives(options, env)
+        created_archive = intermine_docker.create_archives(options, env)
+        depcache.prune(env, options['cache_size'])
         # upload and download of files is possible only if you have valid access keys
         #archive.upload_archives(options, env, 's3')
         #docker.download_archives(options, env, 's3')
+        return created_archive
     else:
         click.echo('Build unsuccessful. Please check error logs.')
         intermine_docker.down(options, env)
+        return False
 
 def load(options, env):
+    from intermine_boot import intermine_docker
     assert_docker(options, env)
 
-    if not os.path.isfile(options['source']):
-        click.echo('Please specify a SOURCE argument to an archive file.', err=True)
-        sys.exit(1)
+    _assert_archive(options)
+    data_dir = env['data_dir'] / 'data'
 
-    if env['data_dir'].is_dir():
-        shutil.rmtree(env['data_dir'])
+    if options['only']:
+        manifest = archive.read_manifest(options['source'])
+        if manifest is None:
+            click.echo('Only archives with a manifest can be partially restored.', err=True)
+            sys.exit(1)
 
-    click.echo('Unpacking archive...')
-    shutil.unpack_archive(options['source'], env['data_dir'] / 'data')
+        mine_names = [os.path.basename(prop_file).replace('.properties', '') for prop_file in
+                      glob.glob(str(data_dir / 'mine' / 'intermine' / '*.properties'))]
+        if manifest['mine'] not in mine_names:
+            click.echo('Partial restore needs existing data of the ' + manifest['mine'] + ' mine. Load the whole archive instead.', err=True)
+            sys.exit(1)
+
+        click.echo('Restoring ' + ', '.join(options['only']) + ' from archive...')
+        for component in options['only']:
+            for prefix in manifest['components'][component]:
+                # Keep the trash out of the data directory, where orphans
+                # would never be found and would end up in archives.
+                trash.remove(data_dir / prefix, trash_dir=env['data_dir'].parent)
+        archive.extract_archive(options['source'], data_dir, options['only'])
+    else:
+        if env['data_dir'].is_dir():
+            trash.remove(env['data_dir'])
+
+        click.echo('Unpacking archive...')
+        if zipfile.is_zipfile(options['source']):
+            archive.extract_archive(options['source'], data_dir)
+        else:
+            shutil.unpack_archive(options['source'], data_dir)
 
     try:
         status = intermine_docker.up(options, env, reuse=True)
@@ -90,16 +131,96 @@ def load(options, env):
         raise
 
     if status:
+        if options['warmup']:
+            from intermine_boot import warmup
+            warmup.run(options, env)
+
         # TODO: Once we support building mines other than biotestmine, we should make this text dynamic.
         click.echo('Build completed. Visit http://localhost:9999/biotestmine to access your mine.')
     else:
         click.echo('Build unsuccessful. Please check error logs.')
         intermine_docker.down(options, env)
 
+def _assert_archive(options):
+    if not options['source'] or not os.path.isfile(options['source']):
+        click.echo('Please specify a SOURCE argument to an archive file.', err=True)
+        sys.exit(1)
+
+def inspect(options, env):
+    _assert_archive(options)
+
+    manifest = archive.read_manifest_or_exit(options['source'])
+    click.echo(archive.format_manifest(manifest))
+
+def verify(options, env):
+    _assert_archive(options)
+
+    click.echo('Verifying ' + options['source'] + '...')
+    failures = archive.verify_archive(options['source'], options['only'])
+    for (name, reason) in failures:
+        click.echo(name + ': ' + reason, err=True)
+
+    if failures:
+        click.echo('%d files failed verification.' % len(failures), err=True)
+        sys.exit(1)
+    click.echo('All files verified.')
+
 def clean(options, env):
     if env['data_dir'].is_dir():
         click.echo('Cleaning intermine_boot data')
-        shutil.rmtree(env['data_dir'])
+        trash.remove(env['data_dir'])
+
+    depcache.prune(env, options['cache_size'])
+
+def prefetch(options, env):
+    from intermine_boot import intermine_docker
+    assert_docker(options, env)
+
+    if options['offline']:
+        click.echo('Cannot prefetch dependencies in offline mode.', err=True)
+        sys.exit(1)
+
+    status = intermine_docker.prefetch(options, env)
+    if status:
+        click.echo('Dependencies cached in ' + str(depcache.get_cache_dir(env)))
+        depcache.prune(env, options['cache_size'])
+    else:
+        click.echo('Prefetch unsuccessful. Please check error logs.')
+        sys.exit(1)
+
+def clone(options, env):
+    from intermine_boot import intermine_docker
+    if not options['workspace']:
+        click.echo('Please specify the name of the new workspace with --workspace.', err=True)
+        sys.exit(1)
+
+    src = workspace.get_data_dir(env['data_home'], options['clone_from'])
+    if src == env['data_dir']:
+        click.echo('Cannot clone a workspace into itself.', err=True)
+        sys.exit(1)
+
+    if intermine_docker.is_running():
+        click.echo('Please stop the running mine with `intermine_boot stop local` before cloning.', err=True)
+        sys.exit(1)
+
+    click.echo('Cloning ' + str(src) + ' to ' + str(env['data_dir']) + '...')
+    method = workspace.clone(src, env['data_dir'])
+    click.echo('Created workspace ' + options['workspace'] + ' using ' + method + '.')
+
+def bench(options, env):
+    from intermine_boot import bench as benchmark
+    assert_docker(options, env)
+
+    if not benchmark.run(options, env):
+        sys.exit(1)
+
+def serve(options, env):
+    from intermine_boot import daemon
+    assert_docker(options, env)
+
+    daemon_env = dict(env)
+    daemon_env['daemon'] = True
+    daemon.serve(options, daemon_env)
 
 def _not_implemented(options, env):
     click.echo('This mode has not been implemented yet.')
@@ -111,8 +232,33 @@ def invoke(mode, options, env):
         'stop': stop,
         'build': build,
         'load': load,
-        'clean': clean
+        'clean': clean,
+        'prefetch': prefetch,
+        'clone': clone,
+        'daemon': serve,
+        'bench': bench,
+        'inspect': inspect,
+        'verify': verify
     }
 
+    # Resume deleting data left behind by interrupted removals.
+    trash.remove_orphans([env['data_home'], env['data_home'] / workspace.WORKSPACES_DIR])
+
+    if mode in ['start', 'build'] and not env.get('daemon'):
+        from intermine_boot import daemon
+        # The daemon doesn't accept builds of a custom InterMine or images, nor
+        # its own settings, so run those here.
+        local_options = daemon.get_local_options(options)
+        running = daemon.is_running(options)
+        if running and local_options:
+            click.echo('Not using the intermine_boot daemon, as it does not take ' +
+                       ', '.join('--' + name.replace('_', '-') for name in local_options) + '.')
+        elif running:
+            status = daemon.delegate(options, env)
+            if status['buildStatus'] != 'complete':
+                click.echo(status.get('errorDetails', 'Build unsuccessful.'), err=True)
+                sys.exit(1)
+            return
+
     func = modes.get(mode, _not_implemented)
     return func(options, env)
@@ -0,0 +1,460 @@
+"""
+Long-running local daemon serving the build endpoints of openapi.json.
+
+Builds are queued and run one after another in the daemon process, which
+keeps its Docker connection and pulled images between builds. The CLI
+hands `start` and `build` over to the daemon when one is listening on
+--daemon-port.
+
+Every request must carry the token the daemon writes to a user-only file on
+startup, as `Authorization: Bearer TOKEN`, and must not carry an Origin
+header, so that web pages can't drive the daemon.
+
+Endpoints:
+
+POST /build/trigger - Queue a build. The application/json body takes the CLI
+options listed in SUBMIT_KEYS plus "cwd", the directory to write archives to
+(eg. {"mode": "build", "source": "/path/to/mine"}). Responds with
+{"mineId": ...} identifying the build.
+
+GET /build/status?mineId=ID - Status of a build, or of the latest one if
+mineId is not given.
+
+GET /build/logs?mineId=ID&offset=N - Stream the output of a build, from the
+Nth chunk on, until it finishes.
+
+GET /mines - Mines built in any workspace.
+
+GET /data/files - Archives created by `build` jobs.
+"""
+import glob
+import hmac
+import io
+import json
+import os
+import queue
+import secrets
+import sys
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlparse, parse_qs
+import click
+from intermine_boot import trash
+from intermine_boot import workspace
+
+# Containers have fixed names and host ports, so only one build can use the
+# docker host at a time.
+DAEMON_WORKERS = 1
+DELEGATED_MODES = ['start', 'build']
+
+# Options a build request may set. Building InterMine from an arbitrary
+# repository (--build-im) and the daemon's own settings are left out.
+SUBMIT_KEYS = ['mode', 'source', 'workspace', 'rebuild', 'im_version',
+               'bio_version', 'offline', 'warmup', 'warmup_config', 'cwd']
+FLAG_KEYS = ['rebuild', 'offline', 'warmup']
+# Options that can't be null, unlike the others which fall back to defaults.
+NOT_NULL_KEYS = FLAG_KEYS + ['cwd']
+# Options naming files, which are relative to the CLI's working directory.
+PATH_KEYS = ['source', 'warmup_config']
+# Options that have no effect on start and build.
+IGNORED_KEYS = ['target', 'daemon_port', 'clone_from', 'only', 'concurrency',
+                'requests', 'bench_config', 'bench_output']
+
+_local = threading.local()
+
+
+class _JobOutput(io.TextIOBase):
+    '''
+    Sends writes made by a job's thread to that job's log, and everything else
+    to the wrapped stream.
+    '''
+    encoding = 'utf-8'
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, text):
+        if not isinstance(text, str):
+            raise TypeError('write() argument must be str')
+
+        job = getattr(_local, 'job', None)
+        if job is None:
+            return self.stream.write(text)
+
+        job.append_log(text)
+        return len(text)
+
+    def flush(self):
+        self.stream.flush()
+
+
+class Job:
+    def __init__(self, options, env):
+        self.job_id = str(uuid.uuid4())
+        self.options = options
+        self.env = env
+        self.status = 'not_yet_started'
+        self.error = None
+        self.archive = None
+        self.log = []
+        self.changed = threading.Condition()
+
+    def append_log(self, text):
+        if not text:
+            return
+        with self.changed:
+            self.log.append(text)
+            self.changed.notify_all()
+
+    def set_status(self, status, error=None):
+        with self.changed:
+            self.status = status
+            self.error = error
+            self.changed.notify_all()
+
+    def is_done(self):
+        return self.status in ['complete', 'errored']
+
+    def to_status(self):
+        status = {'buildStatus': self.status}
+        if self.error:
+            status['errorDetails'] = self.error
+        return status
+
+
+class Daemon:
+    def __init__(self, options, env):
+        self.options = options
+        self.env = env
+        self.jobs = {}
+        self.latest_job = None
+        self.queue = queue.Queue()
+
+    def submit(self, request):
+        if not isinstance(request, dict):
+            raise ValueError('request must be a JSON object')
+
+        unknown_keys = sorted(set(request) - set(SUBMIT_KEYS))
+        if unknown_keys:
+            raise ValueError('unsupported options: ' + ', '.join(unknown_keys))
+
+        for (key, value) in request.items():
+            expected = bool if key in FLAG_KEYS else str
+            if not (isinstance(value, expected) or (value is None and key not in NOT_NULL_KEYS)):
+                raise ValueError(key + ' must be a ' + expected.__name__)
+
+        job_options = dict(self.options)
+        for key in SUBMIT_KEYS:
+            if key in request and key in job_options:
+                job_options[key] = request[key]
+
+        if job_options['mode'] not in DELEGATED_MODES:
+            raise ValueError('mode must be one of ' + ', '.join(DELEGATED_MODES))
+        if job_options['source'] and not os.path.exists(job_options['source']):
+            raise ValueError('source does not exist: ' + job_options['source'])
+
+        if job_options['workspace'] and not workspace.is_valid_name(job_options['workspace']):
+            raise ValueError('invalid workspace: ' + job_options['workspace'])
+        data_dir = workspace.get_data_dir(self.env['data_home'], job_options['workspace'])
+
+        cwd = request.get('cwd', str(self.env['cwd']))
+        if not os.path.isabs(cwd) or not os.path.isdir(cwd):
+            raise ValueError('cwd must be an existing absolute directory')
+
+        job_env = dict(self.env)
+        job_env['data_dir'] = data_dir
+        job_env['cwd'] = Path(cwd)
+
+        job = Job(job_options, job_env)
+        self.jobs[job.job_id] = job
+        self.latest_job = job
+        self.queue.put(job)
+        return job
+
+    def get_job(self, job_id):
+        if job_id is None:
+            return self.latest_job
+        return self.jobs.get(job_id)
+
+    def get_mines(self):
+        mines = []
+        port = str(os.environ.get('TOMCAT_HOST_PORT', 9999))
+        data_dirs = [workspace.get_data_dir(self.env['data_home'])] + sorted(
+            path for path in (self.env['data_home'] / workspace.WORKSPACES_DIR).glob('*')
+            if not path.name.startswith(trash.TRASH_PREFIX))
+        for data_dir in data_dirs:
+            for prop_file in glob.glob(str(data_dir / 'data' / 'mine' / 'intermine' / '*.properties')):
+                mine_name = os.path.basename(prop_file).replace('.properties', '')
+                mines.append({
+                    'mineName': mine_name,
+                    'minelocation': 'http://localhost:' + port + '/' + mine_name
+                })
+        return mines
+
+    def get_files(self):
+        return [{'fileId': job.job_id, 'fileName': job.archive}
+                for job in self.jobs.values() if job.archive]
+
+    def _run(self, job):
+        from intermine_boot import commands
+        from intermine_boot import intermine_docker
+
+        _local.job = job
+        job.set_status('running')
+        try:
+            # A queued build replaces the mine left running by the previous one.
+            intermine_docker.down(job.options, job.env)
+            result = commands.invoke(job.options['mode'], job.options, job.env)
+        except BaseException as e:
+            job.set_status('errored', repr(e))
+            return
+        finally:
+            _local.job = None
+
+        if not result:
+            job.set_status('errored', 'Build unsuccessful. Please check error logs.')
+            return
+
+        if job.options['mode'] == 'build':
+            job.archive = result
+        job.set_status('complete')
+
+    def work(self):
+        while True:
+            self._run(self.queue.get())
+
+
+def _get_token_file(env):
+    return env['data_home'] / 'intermine_boot_daemon' / 'token'
+
+
+def _write_token(env):
+    token_file = _get_token_file(env)
+    token_file.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+    os.chmod(token_file.parent, 0o700)
+
+    token = secrets.token_hex(32)
+    fd = os.open(token_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w') as f:
+        os.fchmod(f.fileno(), 0o600)
+        f.write(token)
+    return token
+
+
+def _read_token(env):
+    try:
+        return _get_token_file(env).read_text().strip()
+    except FileNotFoundError:
+        return ''
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    daemon = None
+    token = None
+
+    def log_message(self, format, *args):
+        click.echo('%s - %s' % (self.address_string(), format % args))
+
+    def _send_json(self, code, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _get_job(self, query):
+        job = self.daemon.get_job(query.get('mineId', [None])[0])
+        if job is None:
+            self._send_json(404, {'errorDetails': 'No such build'})
+        return job
+
+    def _stream_logs(self, job, offset):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; charset=utf-8')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        while True:
+            with job.changed:
+                while offset >= len(job.log) and not job.is_done():
+                    job.changed.wait()
+                chunk = ''.join(job.log[offset:]).encode('utf-8')
+                offset = len(job.log)
+                done = job.is_done()
+
+            if chunk:
+                self.wfile.write(b'%x\r\n%s\r\n' % (len(chunk), chunk))
+                self.wfile.flush()
+            if done:
+                break
+
+        self.wfile.write(b'0\r\n\r\n')
+
+    def _is_authorized(self):
+        if 'Origin' in self.headers:
+            self._send_json(403, {'errorDetails': 'Cross-origin requests are not allowed'})
+            return False
+
+        authorization = self.headers.get('Authorization', '')
+        if not (self.token and hmac.compare_digest(authorization, 'Bearer ' + self.token)):
+            self._send_json(401, {'errorDetails': 'Missing or invalid token'})
+            return False
+
+        return True
+
+    def do_GET(self):
+        if not self._is_authorized():
+            return
+
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+
+        if url.path == '/build/status':
+            if self.daemon.latest_job is None and 'mineId' not in query:
+                self._send_json(200, {'buildStatus': 'not_yet_started'})
+                return
+            job = self._get_job(query)
+            if job:
+                self._send_json(200, job.to_status())
+        elif url.path == '/build/logs':
+            try:
+                offset = int(query.get('offset', [0])[0])
+                if offset < 0:
+                    raise ValueError
+            except ValueError:
+                self._send_json(400, {'errorDetails': 'offset must be a non-negative integer'})
+                return
+            job = self._get_job(query)
+            if job:
+                try:
+                    self._stream_logs(job, offset)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+        elif url.path == '/mines':
+            self._send_json(200, self.daemon.get_mines())
+        elif url.path == '/data/files':
+            self._send_json(200, self.daemon.get_files())
+        else:
+            self._send_json(404, {'errorDetails': 'Not found'})
+
+    def do_POST(self):
+        if not self._is_authorized():
+            return
+
+        if urlparse(self.path).path != '/build/trigger':
+            self._send_json(404, {'errorDetails': 'Not found'})
+            return
+
+        if self.headers.get_content_type() != 'application/json':
+            self._send_json(415, {'errorDetails': 'Content-Type must be application/json'})
+            return
+
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(length) or b'{}')
+            job = self.daemon.submit(request)
+        except ValueError as e:
+            self._send_json(400, {'errorDetails': str(e)})
+            return
+
+        self._send_json(200, {'mineId': job.job_id})
+
+
+def serve(options, env):
+    daemon = Daemon(options, env)
+    _Handler.daemon = daemon
+    _Handler.token = _write_token(env)
+
+    sys.stdout = _JobOutput(sys.stdout)
+    sys.stderr = _JobOutput(sys.stderr)
+
+    for _ in range(DAEMON_WORKERS):
+        threading.Thread(target=daemon.work, daemon=True).start()
+
+    server = ThreadingHTTPServer(('127.0.0.1', options['daemon_port']), _Handler)
+    click.echo('Listening on http://127.0.0.1:%d' % options['daemon_port'])
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def _get_url(options, path):
+    return 'http://127.0.0.1:%d%s' % (options['daemon_port'], path)
+
+
+def is_running(options):
+    import urllib.request
+    import urllib.error
+
+    try:
+        urllib.request.urlopen(_get_url(options, '/build/status'), timeout=1).close()
+    except urllib.error.HTTPError:
+        # The probe carries no token, so a running daemon answers 401.
+        return True
+    except (urllib.error.URLError, OSError):
+        return False
+    return True
+
+
+def get_local_options(options):
+    '''
+    Returns the names of the options changed from their defaults that the
+    daemon doesn't take, in which case the build has to run locally.
+    '''
+    ctx = click.get_current_context(silent=True)
+    if ctx is None:
+        return []
+
+    return [param.name for param in ctx.command.params
+            if param.name in options and param.name not in SUBMIT_KEYS + IGNORED_KEYS
+            and options[param.name] != param.default]
+
+
+def delegate(options, env):
+    '''
+    Runs a build through the daemon, printing its output as it goes.
+    Returns the final build status.
+    '''
+    import urllib.request
+    import urllib.error
+
+    request = {key: options[key] for key in SUBMIT_KEYS if key in options}
+    for key in PATH_KEYS:
+        if request.get(key):
+            request[key] = os.path.abspath(request[key])
+    request['cwd'] = str(env['cwd'])
+
+    headers = {'Authorization': 'Bearer ' + _read_token(env)}
+
+    trigger = urllib.request.Request(
+        _get_url(options, '/build/trigger'),
+        data=json.dumps(request).encode('utf-8'),
+        headers=dict(headers, **{'Content-Type': 'application/json'}))
+    try:
+        with urllib.request.urlopen(trigger) as response:
+            job_id = json.load(response)['mineId']
+    except urllib.error.HTTPError as e:
+        try:
+            details = json.load(e).get('errorDetails', e.reason)
+        except ValueError:
+            details = e.reason
+        click.echo('The intermine_boot daemon rejected the build: ' + str(details), err=True)
+        sys.exit(1)
+
+    click.echo('Queued build ' + job_id + ' on the intermine_boot daemon.')
+
+    logs = urllib.request.Request(_get_url(options, '/build/logs?mineId=' + job_id), headers=headers)
+    with urllib.request.urlopen(logs) as response:
+        for line in response:
+            click.echo(line.decode('utf-8', errors='replace'), nl=False)
+
+    status = urllib.request.Request(_get_url(options, '/build/status?mineId=' + job_id), headers=headers)
+    with urllib.request.urlopen(status) as response:
+        return json.load(response)
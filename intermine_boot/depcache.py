@@ -0,0 +1,141 @@
+"""
+Shared Maven/Gradle dependency cache for the intermine_builder container.
+
+The cache lives outside of the per-mine data directory, so that it survives
+rebuilds, configuration changes and `clean`, and is shared by every mine
+built with this tool.
+"""
+import os
+import shutil
+import click
+
+OFFLINE_INIT_SCRIPT = 'intermine_boot-offline.gradle'
+
+# Gradle init script used by `prefetch` to resolve every resolvable
+# configuration of every project without running the build itself.
+PREFETCH_INIT_SCRIPT = '''\
+allprojects {
+    task intermineBootPrefetch {
+        doLast {
+            (buildscript.configurations + configurations).findAll { it.canBeResolved }.each { conf ->
+                try {
+                    conf.resolve()
+                } catch (e) {
+                    logger.warn("Could not resolve ${project.path}:${conf.name}: ${e.message}")
+                }
+            }
+        }
+    }
+}
+'''
+
+
+def get_cache_dir(env):
+    return env['cache_dir'] / 'dependencies'
+
+
+def prepare(env):
+    '''
+    Creates the cache directories.
+    '''
+    cache_dir = get_cache_dir(env)
+    (cache_dir / 'm2').mkdir(parents=True, exist_ok=True)
+    (cache_dir / 'gradle' / 'init.d').mkdir(parents=True, exist_ok=True)
+
+
+def get_volumes(options, env):
+    '''
+    Returns the docker volumes mounting the cache into the builder's home.
+    '''
+    cache_dir = get_cache_dir(env)
+    m2_dir = cache_dir / 'm2'
+    if options.get('build_im'):
+        # A custom InterMine build installs its artifacts into ~/.m2 with the
+        # same versions as the released ones, so keep those out of the cache
+        # shared with other mines.
+        m2_dir = env['data_dir'] / 'data' / 'mine' / 'packages'
+
+    volumes = {
+        m2_dir: {
+            'bind': '/home/intermine/.m2',
+            'mode': 'rw'
+        },
+        cache_dir / 'gradle': {
+            'bind': '/home/intermine/.gradle',
+            'mode': 'rw'
+        }
+    }
+
+    if options.get('offline'):
+        # Mounted into this container only, so that builds sharing the cache
+        # are not switched to or from offline mode.
+        click.echo('Resolving dependencies offline from ' + str(cache_dir))
+        offline_script = env['data_dir'] / OFFLINE_INIT_SCRIPT
+        offline_script.write_text('gradle.startParameter.offline = true\n')
+        volumes[offline_script] = {
+            'bind': '/home/intermine/.gradle/init.d/' + OFFLINE_INIT_SCRIPT,
+            'mode': 'ro'
+        }
+
+    return volumes
+
+
+def _get_artifact_dirs(cache_dir):
+    '''
+    Yields the directories holding a single artifact version, which are the
+    units of eviction.
+    '''
+    # Maven layout: repository/<group path>/<artifact>/<version>/*.pom
+    for dirpath, _, filenames in os.walk(cache_dir / 'm2' / 'repository'):
+        if any(name.endswith('.pom') for name in filenames):
+            yield dirpath
+
+    # Gradle layout: files-2.1/<group>/<artifact>/<version>/<sha1>/<file>
+    files_dir = cache_dir / 'gradle' / 'caches' / 'modules-2' / 'files-2.1'
+    for path in files_dir.glob('*/*/*'):
+        if path.is_dir():
+            yield str(path)
+
+
+def _get_usage(path):
+    size = 0
+    last_used = 0
+    for dirpath, _, filenames in os.walk(path):
+        for name in filenames:
+            try:
+                stat = os.stat(os.path.join(dirpath, name))
+            except FileNotFoundError:
+                continue
+            size += stat.st_size
+            last_used = max(last_used, stat.st_atime, stat.st_mtime)
+    return (size, last_used)
+
+
+def prune(env, max_size_mb):
+    '''
+    Evicts the least recently used artifacts until the cache fits within
+    max_size_mb. Returns the number of bytes freed.
+    '''
+    cache_dir = get_cache_dir(env)
+    if not cache_dir.is_dir():
+        return 0
+
+    artifacts = []
+    total_size = 0
+    for path in _get_artifact_dirs(cache_dir):
+        (size, last_used) = _get_usage(path)
+        artifacts.append((last_used, size, path))
+        total_size += size
+
+    max_size = max_size_mb * 1024 * 1024
+    freed = 0
+    for (_, size, path) in sorted(artifacts):
+        if total_size - freed <= max_size:
+            break
+        shutil.rmtree(path, ignore_errors=True)
+        freed += size
+
+    if freed:
+        click.echo('Evicted %d MB from the dependency cache' % (freed // (1024 * 1024)))
+
+    return freed
@@ -4,17 +4,39 @@ import pickle as pkl
 import subprocess
 import shutil
 import os
-from git import Repo,cmd
-import yaml
-from intermine_boot import utils
 import click
 import re
 import glob
 import sys
+import tempfile
+from intermine_boot import depcache
+from intermine_boot import trash
+from intermine_boot import archive
+from importlib import metadata
 
 # all docker containers created would be attached to this network
 DOCKER_NETWORK_NAME = 'intermine_boot'
 
+DEFAULT_MINE_REPO_URL = 'https://github.com/intermine/biotestmine'
+
+# Reused for the lifetime of the process, which matters for the daemon.
+_client = None
+_pulled_images = {}
+
+def _get_client():
+    global _client
+    if _client is None:
+        _client = docker.from_env()
+    return _client
+
+def _pull_image(client, name):
+    '''
+    Pulls an image once per process. Restart the daemon to pick up new images.
+    '''
+    if name not in _pulled_images:
+        _pulled_images[name] = client.images.pull(name)
+    return _pulled_images[name]
+
 def _get_docker_user():
     return str(os.getuid()) + ':' + str(os.getgid())
 
@@ -49,9 +71,13 @@ def _store_conf(path_to_config, options):
     return
 
 def _get_mine_name(options, env):
-    if options['mode'] in ['start', 'build'] and options['source']:
+    if options['mode'] in ['start', 'build', 'prefetch'] and options['source']:
         return os.path.basename(os.path.abspath(options['source']))
     elif options['source']: # Likely path to an archive.
+        manifest = archive.read_manifest(options['source'])
+        if manifest is not None:
+            return manifest['mine']
+
         prop_files = glob.glob(str(env['data_dir'] / 'data' / 'mine' / 'intermine' / '*.properties'))
         try:
             mine_name = os.path.basename(prop_files[0]).replace('.properties', '')
@@ -103,18 +129,19 @@ def up(options, env, reuse=False):
     if (env['data_dir']).is_dir():
         if options['rebuild']:
             click.echo('Forced rebuild. Removing existing data if any...')
-            shutil.rmtree(env['data_dir'])
+            trash.remove(env['data_dir'])
         elif reuse:
             pass
         elif _is_conf_same(env['data_dir'], options):
             click.echo('Same configuration exists. Using existing data...')
         else:
             click.echo('Configuration change detected. Removing existing data if any...')
-            shutil.rmtree(env['data_dir'])
+            trash.remove(env['data_dir'])
 
     (env['data_dir']).mkdir(parents=True, exist_ok=True)
 
     _create_volumes(options, env)
+    depcache.prepare(env)
 
     if options['mode'] in ['start', 'build'] and options['source']:
         click.echo('Source path is ' + os.path.abspath(options['source']))
@@ -126,7 +153,7 @@ def up(options, env, reuse=False):
     elif not options['source']:
         click.echo('No source path specified. Will build biotestmine.')
 
-    client = docker.from_env()
+    client = _get_client()
     if options['build_images']:
         click.echo('Building images...')
         img_path = _get_container_path()
@@ -140,10 +167,10 @@ def up(options, env, reuse=False):
             path=str(img_path / 'intermine_builder'), tag='builder', dockerfile='intermine_builder.Dockerfile')[0]
     else:
         click.echo('Pulling images...')
-        tomcat_image = client.images.pull('intermine/tomcat:latest')
-        solr_image = client.images.pull('intermine/solr:latest')
-        postgres_image = client.images.pull('intermine/postgres:latest')
-        intermine_builder_image = client.images.pull('intermine/builder:latest')
+        tomcat_image = _pull_image(client, 'intermine/tomcat:latest')
+        solr_image = _pull_image(client, 'intermine/solr:latest')
+        postgres_image = _pull_image(client, 'intermine/postgres:latest')
+        intermine_builder_image = _pull_image(client, 'intermine/builder:latest')
 
     docker_network = _create_network_if_not_exist(client)
     click.echo('Starting containers...')
@@ -168,12 +195,21 @@ def _remove_container(client, container_name):
         container.remove(force=True)
 
 
+def is_running():
+    try:
+        _get_client().containers.get('postgres')
+    except docker.errors.DockerException:
+        return False
+    return True
+
+
 def down(options, env):
-    client = docker.from_env()
+    client = _get_client()
     _remove_container(client, 'tomcat')
     _remove_container(client, 'postgres')
     _remove_container(client, 'solr')
     _remove_container(client, 'intermine_builder')
+    _remove_container(client, 'intermine_prefetch')
 
     try:
         client.networks.get('intermine_boot').remove()
@@ -181,13 +217,111 @@ def down(options, env):
         pass
 
 
+def _read_properties(properties_file):
+    properties = {}
+    try:
+        with open(properties_file) as props:
+            for line in props:
+                (key, sep, value) = line.partition('=')
+                if sep and not key.startswith('#'):
+                    properties[key.strip()] = value.strip()
+    except EnvironmentError:
+        pass
+    return properties
+
+
+def _read_mine_properties(options, env):
+    return _read_properties(
+        env['data_dir'] / 'data' / 'mine' /  'intermine' / (_get_mine_name(options, env) + '.properties'))
+
+
+def run_psql(options, env, sql):
+    '''
+    Runs sql against the mine's production database in the postgres container.
+    Returns whether it succeeded along with the output of psql.
+    '''
+    properties = _read_mine_properties(options, env)
+    database = properties.get('db.production.datasource.databaseName', _get_mine_name(options, env))
+    user = properties.get('db.production.datasource.user', 'postgres')
+
+    container = _get_client().containers.get('postgres')
+    (exit_code, output) = container.exec_run(
+        ['psql', '-U', user, '-d', database, '-tA', '-c', sql])
+    return (exit_code == 0, output.decode('utf-8'))
+
+
+def get_container_images(names):
+    '''
+    Returns the image tags and ID of each of the named containers that exist,
+    along with the MEM_OPTS they were started with.
+    '''
+    client = _get_client()
+    images = {}
+    for name in names:
+        try:
+            container = client.containers.get(name)
+        except docker.errors.NotFound:
+            continue
+        container_env = dict(var.partition('=')[::2] for var in container.attrs['Config']['Env'] or [])
+        images[name] = {
+            'tags': container.image.tags,
+            'id': container.image.id,
+            'mem_opts': container_env.get('MEM_OPTS')
+        }
+    return images
+
+
+def stream_container_stats(name):
+    '''
+    Yields (CPU percentage, memory usage in bytes) samples of the named
+    container, about once a second.
+    '''
+    container = _get_client().containers.get(name)
+    for stats in container.stats(stream=True, decode=True):
+        cpu = stats.get('cpu_stats', {})
+        precpu = stats.get('precpu_stats', {})
+        # The first frame has no previous sample, so its CPU usage would be
+        # the average over the container's lifetime.
+        if 'system_cpu_usage' not in precpu:
+            continue
+
+        cpu_delta = (cpu.get('cpu_usage', {}).get('total_usage', 0) -
+                     precpu.get('cpu_usage', {}).get('total_usage', 0))
+        system_delta = cpu.get('system_cpu_usage', 0) - precpu.get('system_cpu_usage', 0)
+        cpus = cpu.get('online_cpus') or len(cpu.get('cpu_usage', {}).get('percpu_usage') or [None])
+        cpu_percent = cpu_delta / system_delta * cpus * 100.0 if system_delta > 0 else 0.0
+
+        memory = stats.get('memory_stats', {})
+        # Like `docker stats`, don't count the page cache as used memory.
+        memory_usage = memory.get('usage', 0) - memory.get('stats', {}).get('inactive_file', 0)
+
+        yield (cpu_percent, memory_usage)
+
+
+def _get_image_digests(options):
+    '''
+    Returns the ID and repository digests of the images used to run the mine.
+    '''
+    client = _get_client()
+    images = {}
+    for name in ['tomcat', 'solr', 'postgres', 'builder']:
+        tag = name if options['build_images'] else 'intermine/' + name + ':latest'
+        try:
+            image = client.images.get(tag)
+        except docker.errors.ImageNotFound:
+            continue
+        images[name] = {'id': image.id, 'digests': image.attrs.get('RepoDigests', [])}
+    return images
+
+
 def create_archives(options, env):
-    properties_file = env['data_dir'] / 'data' / 'mine' /  'intermine' / (_get_mine_name(options, env) + '.properties')
+    mine_name = _get_mine_name(options, env)
+    properties_file = env['data_dir'] / 'data' / 'mine' /  'intermine' / (mine_name + '.properties')
 
     archive_filename = ''
+    title = ''
+    version = ''
     try:
-        title = ''
-        version = ''
         with open(properties_file) as props:
             title_re = re.compile("^project\\.title=(.+)$")
             version_re = re.compile("^project\\.releaseVersion=(.+)$")
@@ -214,11 +348,96 @@ def create_archives(options, env):
     except EnvironmentError:
         archive_filename = 'mine'
 
-    archive = env['cwd'] / archive_filename
+    # The builder writes the versions it used into the mine's gradle.properties.
+    gradle_properties = _read_properties(env['data_dir'] / 'data' / 'mine' / mine_name / 'gradle.properties')
+
+    manifest = {
+        'mine': mine_name,
+        'title': title,
+        'release_version': version,
+        'intermine_boot_version': metadata.version('intermine_boot'),
+        'im_version': gradle_properties.get('systemProp.imVersion', options['im_version']),
+        'bio_version': gradle_properties.get('systemProp.bioVersion', options['bio_version']),
+        'images': _get_image_digests(options)
+    }
+    if options['build_im']:
+        manifest['im_repo'] = options['im_repo']
+        manifest['im_branch'] = options['im_branch']
+
     target_dir = env['data_dir'] / 'data'
-    created_archive = shutil.make_archive(archive, 'zip', root_dir=target_dir)
+    created_archive = archive.write_archive(
+        str(env['cwd'] / (archive_filename + '.zip')), target_dir, manifest)
 
     click.echo('\n\nCreated archive ' + created_archive)
+    return created_archive
+
+def prefetch(options, env):
+    '''
+    Resolves all dependencies of the mine into the shared dependency cache,
+    without building the mine.
+    '''
+    depcache.prepare(env)
+
+    client = _get_client()
+    if options['build_images']:
+        click.echo('Building builder image...')
+        image = client.images.build(
+            path=str(_get_container_path() / 'intermine_builder'), tag='builder',
+            dockerfile='intermine_builder.Dockerfile')[0]
+    else:
+        click.echo('Pulling builder image...')
+        image = _pull_image(client, 'intermine/builder:latest')
+
+    mine_name = _get_mine_name(options, env)
+    home = '/home/intermine'
+
+    with tempfile.TemporaryDirectory(prefix='intermine_boot_') as tmpdir:
+        tmpdir = Path(tmpdir)
+
+        if options['source']:
+            mine_path = Path(os.path.abspath(options['source']))
+        else:
+            mine_repo_url = os.environ.get('MINE_REPO_URL') or DEFAULT_MINE_REPO_URL
+            click.echo('No source path specified. Cloning ' + mine_repo_url)
+            mine_path = tmpdir / mine_name
+            # gitpython is only needed here, so keep it out of startup time.
+            from git import Repo
+            from intermine_boot import utils
+            Repo.clone_from(mine_repo_url, mine_path,
+                            progress=utils.GitProgressPrinter(),
+                            multi_options=['--depth 1'])
+
+        init_script = tmpdir / 'prefetch.gradle'
+        init_script.write_text(depcache.PREFETCH_INIT_SCRIPT)
+
+        volumes = {
+            mine_path: {
+                'bind': home + '/intermine/' + mine_name,
+                'mode': 'rw'
+            },
+            init_script: {
+                'bind': home + '/prefetch.gradle',
+                'mode': 'ro'
+            }
+        }
+        volumes.update(depcache.get_volumes(options, env))
+
+        click.echo('\n\nPrefetching dependencies of ' + mine_name + '...\n\n')
+        try:
+            (container, status) = _start_container(
+                client, image, name='intermine_prefetch', user=_get_docker_user(),
+                volumes=volumes, entrypoint=['./gradlew'],
+                command=['--no-daemon', '--init-script', home + '/prefetch.gradle',
+                         'intermineBootPrefetch'],
+                working_dir=home + '/intermine/' + mine_name)
+
+            exit_code = container.wait()['StatusCode']
+        finally:
+            # Only the prefetch container, as a mine may be running alongside.
+            _remove_container(client, 'intermine_prefetch')
+
+    return status and exit_code == 0
+
 
 def create_tomcat_container(client, image):
     envs = {
@@ -325,10 +544,6 @@ def create_intermine_builder_container(client, image, options, env):
             'bind': '/home/intermine/intermine/configs',
             'mode': 'rw'
         },
-        mine_path / 'packages': {
-            'bind': '/home/intermine/.m2',
-            'mode': 'rw'
-        },
         mine_path / 'intermine': {
             'bind': '/home/intermine/.intermine',
             'mode': 'rw'
@@ -338,6 +553,7 @@ def create_intermine_builder_container(client, image, options, env):
             'mode': 'rw'
         }
     }
+    volumes.update(depcache.get_volumes(options, env))
 
     click.echo('\n\nStarting Intermine container...\n\n')
 
@@ -368,12 +584,15 @@ def create_intermine_builder_container(client, image, options, env):
 
 def _start_container(
     client, image, name, user=None, environment=None, volumes=None,
-        network=None, ports=None, log_match=None):
+        network=None, ports=None, log_match=None, entrypoint=None,
+        command=None, working_dir=None):
     status_code = True # A boolean value to indicate whether error occurs
     try:
         container = client.containers.run(
-            image, name=name, user=user, environment=environment,
-            volumes=volumes, network=network, detach=True, ports=ports)
+            image, command=command, name=name, user=user,
+            environment=environment, volumes=volumes, network=network,
+            detach=True, ports=ports, entrypoint=entrypoint,
+            working_dir=working_dir)
 
         for log in container.logs(stream=True, timestamps=True):
             click.echo(log.decode(), nl=False)
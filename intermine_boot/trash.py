@@ -0,0 +1,147 @@
+"""
+Fast removal of data directories.
+
+Directories are atomically renamed aside and deleted by a detached process,
+so commands can carry on while multi-GB Postgres and Solr trees are unlinked
+in the background. Run as `python -m intermine_boot.trash PATH` to delete
+PATH in the foreground.
+"""
+import os
+import shutil
+import subprocess
+import sys
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import click
+
+TRASH_PREFIX = '.intermine_boot-trash-'
+DELETE_WORKERS = 8
+
+
+def _get_pid_file(trash_path):
+    return trash_path.parent / (trash_path.name + '.pid')
+
+
+def _get_failed_file(trash_path):
+    return trash_path.parent / (trash_path.name + '.failed')
+
+
+def _unlink_all(dirpath, names):
+    for name in names:
+        try:
+            os.unlink(os.path.join(dirpath, name))
+        except FileNotFoundError:
+            pass
+
+
+def delete_tree(path, workers=DELETE_WORKERS):
+    '''
+    Deletes the directory tree at path, unlinking files in parallel.
+    '''
+    dirs = []
+    with ThreadPoolExecutor(workers) as pool:
+        for dirpath, dirnames, filenames in os.walk(path):
+            dirs.append(dirpath)
+            # os.walk lists symlinks to directories with the directories.
+            links = [name for name in dirnames
+                     if os.path.islink(os.path.join(dirpath, name))]
+            pool.submit(_unlink_all, dirpath, filenames + links)
+
+    # os.walk is top-down, so reversing it visits children before parents.
+    for dirpath in reversed(dirs):
+        try:
+            os.rmdir(dirpath)
+        except OSError:
+            pass
+
+    # Catch anything that the fast path left behind.
+    shutil.rmtree(path, ignore_errors=True)
+
+
+def _spawn_delete(trash_path):
+    # The pid file is written here rather than by the child, so that no other
+    # invocation can see the trash unattended and spawn a second deleter.
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'intermine_boot.trash', str(trash_path)],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True)
+    _get_pid_file(trash_path).write_text(str(process.pid))
+
+
+def _is_being_deleted(trash_path):
+    try:
+        pid = int(_get_pid_file(trash_path).read_text())
+    except (FileNotFoundError, ValueError):
+        return False
+
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def remove(path, trash_dir=None):
+    '''
+    Moves the directory at path out of the way, into trash_dir if given or
+    next to it otherwise, and deletes it in the background. Returns
+    immediately, after which path is free to reuse. Paths that can't be
+    moved, such as mount points, are emptied in the foreground instead.
+    '''
+    path = Path(path)
+    if not path.is_dir():
+        return
+
+    trash_dir = Path(trash_dir) if trash_dir else path.parent
+    trash_path = trash_dir / (TRASH_PREFIX + path.name + '-' + uuid.uuid4().hex)
+    try:
+        os.rename(path, trash_path)
+    except OSError:
+        delete_tree(path)
+        return
+    _spawn_delete(trash_path)
+
+
+def remove_orphans(parents):
+    '''
+    Resumes deleting trash left in any of parents by interrupted removals.
+    Trash that a previous deleter failed to remove is left alone.
+    '''
+    for parent in parents:
+        for trash_path in Path(parent).glob(TRASH_PREFIX + '*'):
+            if trash_path.suffix in ['.pid', '.failed']:
+                # Bookkeeping of trash that has since been deleted.
+                if not trash_path.with_suffix('').exists():
+                    trash_path.unlink()
+                continue
+
+            if not trash_path.is_dir() or _is_being_deleted(trash_path):
+                continue
+
+            if _get_failed_file(trash_path).exists():
+                click.echo('Could not delete ' + str(trash_path) + '. Please remove it manually.', err=True)
+                continue
+
+            _spawn_delete(trash_path)
+
+
+def main(trash_path):
+    trash_path = Path(trash_path)
+    try:
+        delete_tree(trash_path)
+        if trash_path.exists():
+            _get_failed_file(trash_path).touch()
+    finally:
+        try:
+            _get_pid_file(trash_path).unlink()
+        except FileNotFoundError:
+            pass
+
+
+if __name__ == '__main__':
+    main(sys.argv[1])
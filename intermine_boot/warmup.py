@@ -0,0 +1,114 @@
+"""
+Warm-up of a freshly deployed mine before it is reported as ready.
+
+Replays webservice queries against the mine so that the JVM, the webapp and
+InterMine's query caches are warm, optionally loads Postgres' hot tables into
+shared buffers with pg_prewarm, and reports the latencies seen.
+
+The configuration is a YAML (or JSON) file with any of these keys:
+
+    rounds: 3            # times to replay the queries
+    templates: 5         # number of the mine's templates to run
+    queries:             # paths relative to the mine's webapp
+      - /service/search?q=gene
+      - path: /service/query/results
+        data: {query: '<query model="genomic" view="Gene.symbol"/>', format: json}
+    pg_prewarm: true     # true for the most used tables, or a list of tables
+"""
+import click
+from intermine_boot import intermine_docker
+from intermine_boot import webservice
+
+DEFAULT_CONFIG = {
+    'rounds': 3,
+    'templates': 5,
+    'queries': [
+        '/begin.do',
+        '/service/version',
+        '/service/model?format=json',
+        '/service/lists?format=json',
+        '/service/search?q=gene&size=10'
+    ],
+    'pg_prewarm': False
+}
+
+# Tables most used by past queries, as tracked by Postgres' statistics.
+HOT_TABLES_LIMIT = 20
+
+
+def load_config(path=None):
+    config = dict(DEFAULT_CONFIG)
+    if path:
+        import yaml
+        with open(path) as config_file:
+            config.update(yaml.safe_load(config_file) or {})
+    return config
+
+
+def _get_queries(mine_url, config):
+    queries = []
+    for query in config['queries']:
+        if isinstance(query, str):
+            query = {'path': query}
+        queries.append((query['path'], query.get('data')))
+
+    if config['templates']:
+        for name in webservice.get_template_names(mine_url)[:config['templates']]:
+            queries.append((webservice.get_template_path(name), None))
+
+    return queries
+
+
+def _prewarm_postgres(options, env, tables):
+    if tables is True:
+        sql = ('SELECT relname, pg_prewarm(relid) FROM pg_stat_user_tables '
+               'ORDER BY seq_scan + coalesce(idx_scan, 0) DESC LIMIT %d' % HOT_TABLES_LIMIT)
+    else:
+        tables = [table.replace("'", "''") for table in tables]
+        sql = ' UNION ALL '.join(
+            "SELECT '%s', pg_prewarm('%s')" % (table, table) for table in tables)
+
+    (success, output) = intermine_docker.run_psql(
+        options, env, 'CREATE EXTENSION IF NOT EXISTS pg_prewarm; ' + sql)
+    if not success:
+        click.echo('pg_prewarm failed: ' + output, err=True)
+        return
+
+    blocks = sum(int(line.rpartition('|')[2]) for line in output.splitlines()
+                 if line.rpartition('|')[2].isdigit())
+    click.echo('Loaded %d Postgres blocks into shared buffers' % blocks)
+
+
+def run(options, env):
+    '''
+    Warms up the running mine. Returns the latency summary of the last round,
+    or None if the mine did not become reachable.
+    '''
+    config = load_config(options['warmup_config'])
+    mine_url = webservice.get_mine_url(intermine_docker._get_mine_name(options, env))
+
+    click.echo('Waiting for ' + mine_url + ' to respond...')
+    if not webservice.wait_until_ready(mine_url):
+        click.echo('The mine did not respond in time, skipping warm-up.', err=True)
+        return None
+
+    if config['pg_prewarm']:
+        _prewarm_postgres(options, env, config['pg_prewarm'])
+
+    queries = _get_queries(mine_url, config)
+    rounds = max(1, config['rounds'])
+    for round_number in range(1, rounds + 1):
+        latencies = []
+        errors = 0
+        for (path, data) in queries:
+            (status, seconds, _) = webservice.request(mine_url + path, data=data)
+            latencies.append(seconds)
+            if status != 200:
+                errors += 1
+
+        summary = webservice.summarize(latencies)
+        click.echo('Warm-up round %d/%d: %d requests, %d errors, p50 %s ms, p95 %s ms, p99 %s ms' % (
+            round_number, rounds, summary['count'], errors,
+            summary['p50'], summary['p95'], summary['p99']))
+
+    return summary
@@ -0,0 +1,91 @@
+"""
+Minimal client for the webservice of a locally deployed mine, with timing.
+"""
+import json
+import math
+import os
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+
+def get_mine_url(mine_name):
+    port = os.environ.get('TOMCAT_HOST_PORT', 9999)
+    return 'http://localhost:%s/%s' % (port, mine_name)
+
+
+def request(url, data=None, timeout=60):
+    '''
+    Performs a GET request, or a POST of the form data if given. Returns the
+    status code (None if the server could not be reached), the time taken in
+    seconds and the response body.
+    '''
+    if data is not None:
+        data = urllib.parse.urlencode(data).encode('utf-8')
+
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url, data=data, timeout=timeout) as response:
+            body = response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        body = e.read()
+        status = e.code
+    except (urllib.error.URLError, OSError):
+        body = b''
+        status = None
+
+    return (status, time.perf_counter() - start, body)
+
+
+def wait_until_ready(mine_url, timeout=300):
+    '''
+    Polls the mine's version service until it responds. Returns whether it
+    did so within timeout seconds.
+    '''
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        (status, _, _) = request(mine_url + '/service/version', timeout=10)
+        if status == 200:
+            return True
+        time.sleep(2)
+    return False
+
+
+def get_template_names(mine_url):
+    '''
+    Returns the names of the mine's public templates, sorted.
+    '''
+    (status, _, body) = request(mine_url + '/service/templates?format=json')
+    if status != 200:
+        return []
+    return sorted(json.loads(body.decode('utf-8')).get('templates', {}))
+
+
+def get_template_path(name, size=10):
+    return '/service/template/results?' + urllib.parse.urlencode(
+        {'name': name, 'format': 'json', 'size': size})
+
+
+def percentile(values, p):
+    '''
+    Nearest-rank percentile of values.
+    '''
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, int(math.ceil(p / 100.0 * len(ordered))))
+    return ordered[rank - 1]
+
+
+def summarize(latencies):
+    '''
+    Summarizes latencies given in seconds, in milliseconds.
+    '''
+    summary = {'count': len(latencies)}
+    for p in [50, 95, 99]:
+        value = percentile(latencies, p)
+        summary['p%d' % p] = round(value * 1000, 1) if value is not None else None
+    summary['max'] = round(max(latencies) * 1000, 1) if latencies else None
+    return summary
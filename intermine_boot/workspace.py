@@ -0,0 +1,99 @@
+"""
+Named mine workspaces, each with its own data directory, and cheap
+copy-on-write clones between them.
+
+Clones are plain directories, never snapshots or separate datasets, so they
+can be removed like any other workspace.
+"""
+import os
+import re
+import shutil
+import subprocess
+import sys
+import click
+
+WORKSPACES_DIR = 'intermine_boot_workspaces'
+
+
+def is_valid_name(name):
+    return bool(re.match(r'^[A-Za-z0-9][A-Za-z0-9_.-]*$', name))
+
+
+def get_data_dir(data_home, name=None):
+    '''
+    Returns the data directory of the workspace called name, or of the
+    default workspace if no name is given.
+    '''
+    if not name:
+        return data_home / 'intermine_boot'
+
+    if not is_valid_name(name):
+        click.echo('Invalid workspace name ' + name + '. Use letters, digits, dots, dashes and underscores.', err=True)
+        sys.exit(1)
+
+    return data_home / WORKSPACES_DIR / name
+
+
+def _run(args):
+    try:
+        return subprocess.run(args, stdout=subprocess.PIPE,
+                              stderr=subprocess.PIPE).returncode == 0
+    except FileNotFoundError:
+        return False
+
+
+def _clone_reflink(src, dst):
+    if _run(['cp', '-a', '--reflink=always', str(src), str(dst)]):
+        return True
+    shutil.rmtree(dst, ignore_errors=True)
+    return False
+
+
+def _is_write_once(path):
+    # Lucene never modifies a Solr index segment once written, so those files
+    # can be shared. Everything else, notably Postgres' data files, may be
+    # updated in place and has to be copied.
+    return os.path.basename(os.path.dirname(path)) == 'index' and (
+        os.path.basename(path) != 'write.lock')
+
+
+def _link_or_copy(src, dst):
+    if _is_write_once(src):
+        try:
+            os.link(src, dst)
+            return dst
+        except OSError:
+            pass
+    return shutil.copy2(src, dst)
+
+
+def _clone_hardlink(src, dst):
+    shutil.copytree(src, dst, symlinks=True, copy_function=_link_or_copy)
+    return True
+
+
+CLONE_METHODS = [
+    ('reflink copy', _clone_reflink),
+    ('hardlink tree', _clone_hardlink)
+]
+
+
+def clone(src, dst):
+    '''
+    Creates the data directory dst from src with a reflink copy where the
+    filesystem supports it, or a hardlink tree otherwise. Returns the name of
+    the method used.
+    '''
+    if not src.is_dir():
+        click.echo('Workspace to clone from does not exist: ' + str(src), err=True)
+        sys.exit(1)
+
+    if dst.exists():
+        click.echo('Workspace already exists: ' + str(dst), err=True)
+        sys.exit(1)
+
+    dst.parent.mkdir(parents=True, exist_ok=True)
+
+    for (method_name, method) in CLONE_METHODS:
+        if method(src, dst):
+            return method_name
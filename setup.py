@@ -4,7 +4,7 @@ setup(
     name='intermine_boot',
     version='0.1.0',
     license='LGPL',
-    python_requires='>=3.5',
+    python_requires='>=3.8',
     packages=find_packages(),
     include_package_data=True,
     install_requires=[
@@ -0,0 +1,89 @@
+import unittest
+import os
+import tempfile
+import zipfile
+from pathlib import Path
+from intermine_boot import archive
+
+class TestArchive(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        tmp = Path(self.tmpdir.name)
+        self.data_dir = tmp / 'data'
+        for (path, contents) in [
+                ('postgres/base/16384', 'heap'),
+                ('solr/biotestmine/data/index/_0.cfs', 'segment'),
+                ('mine/intermine/biotestmine.properties', 'project.title=BioTestMine'),
+                ('mine/biotestmine/gradlew', '#!/bin/sh'),
+                ('mine/packages/intermine-api.jar', 'jar')]:
+            (self.data_dir / path).parent.mkdir(parents=True, exist_ok=True)
+            (self.data_dir / path).write_text(contents)
+        os.chmod(self.data_dir / 'mine' / 'biotestmine' / 'gradlew', 0o775)
+        (self.data_dir / 'mine' / 'dumps').mkdir()
+
+        self.archive_path = str(tmp / 'BioTestMine.zip')
+        archive.write_archive(self.archive_path, self.data_dir, {'mine': 'biotestmine'})
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_manifest(self):
+        manifest = archive.read_manifest(self.archive_path)
+
+        self.assertEqual(manifest['mine'], 'biotestmine')
+        self.assertEqual(manifest['files']['postgres/base/16384']['size'], 4)
+        self.assertEqual(archive.get_members(manifest, ['config']), [
+            'mine/biotestmine/gradlew', 'mine/intermine/biotestmine.properties'])
+
+    def test_format_manifest(self):
+        manifest = archive.read_manifest(self.archive_path)
+        manifest.update({'im_version': '5.1.0', 'bio_version': '5.1.0'})
+
+        lines = archive.format_manifest(manifest).splitlines()
+
+        self.assertEqual(lines[0], 'Mine: biotestmine')
+        self.assertIn('InterMine version: 5.1.0', lines)
+        self.assertIn('Bio version: 5.1.0', lines)
+
+    def test_no_manifest(self):
+        legacy_path = os.path.join(self.tmpdir.name, 'legacy.zip')
+        with zipfile.ZipFile(legacy_path, 'w') as zf:
+            zf.writestr('mine/intermine/biotestmine.properties', '')
+
+        self.assertIsNone(archive.read_manifest(legacy_path))
+
+    def test_verify(self):
+        self.assertEqual(archive.verify_archive(self.archive_path, workers=2), [])
+
+    def test_verify_detects_corruption(self):
+        corrupt_path = os.path.join(self.tmpdir.name, 'corrupt.zip')
+        with zipfile.ZipFile(self.archive_path) as src, zipfile.ZipFile(corrupt_path, 'w') as dst:
+            for info in src.infolist():
+                data = src.read(info)
+                if info.filename == 'postgres/base/16384':
+                    data = b'HEAP'
+                dst.writestr(info, data)
+
+        failures = archive.verify_archive(corrupt_path, workers=2)
+
+        self.assertEqual(failures, [('postgres/base/16384', 'checksum mismatch')])
+
+    def test_extract_components(self):
+        target_dir = Path(self.tmpdir.name) / 'restored'
+
+        archive.extract_archive(self.archive_path, target_dir, ['solr', 'config'])
+
+        self.assertTrue((target_dir / 'solr' / 'biotestmine' / 'data' / 'index' / '_0.cfs').is_file())
+        self.assertTrue(os.access(target_dir / 'mine' / 'biotestmine' / 'gradlew', os.X_OK))
+        self.assertFalse((target_dir / 'postgres').exists())
+        self.assertFalse((target_dir / 'mine' / 'packages').exists())
+        self.assertFalse((target_dir / archive.MANIFEST_NAME).exists())
+
+    def test_extract_all(self):
+        target_dir = Path(self.tmpdir.name) / 'restored'
+
+        archive.extract_archive(self.archive_path, target_dir)
+
+        self.assertEqual((target_dir / 'postgres' / 'base' / '16384').read_text(), 'heap')
+        self.assertTrue((target_dir / 'mine' / 'dumps').is_dir())
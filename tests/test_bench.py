@@ -0,0 +1,36 @@
+import unittest
+from unittest import mock
+from intermine_boot import bench
+from intermine_boot import warmup
+
+class TestBench(unittest.TestCase):
+
+    def test_plan_follows_mix(self):
+        config = {
+            'seed': 1,
+            'mix': [
+                {'name': 'search', 'weight': 3, 'path': '/service/search?q=eve'},
+                {'name': 'lists', 'weight': 1, 'path': '/service/lists?format=json'}
+            ]
+        }
+
+        plan = bench._plan('http://localhost:9999/biotestmine', config, 1000)
+
+        self.assertEqual(len(plan), 1000)
+        self.assertEqual(plan, bench._plan('http://localhost:9999/biotestmine', config, 1000))
+        searches = sum(1 for (name, _, _) in plan if name == 'search')
+        self.assertTrue(650 < searches < 850)
+
+    def test_run_stops_if_warmup_fails(self):
+        options = {'bench_config': None, 'warmup': True, 'requests': 10}
+        with mock.patch.object(bench.intermine_docker, '_get_mine_name', return_value='biotestmine'), \
+                mock.patch.object(warmup, 'run', return_value=None), \
+                mock.patch.object(bench, '_plan') as plan:
+            self.assertIsNone(bench.run(options, {}))
+        plan.assert_not_called()
+
+    def test_plan_without_templates(self):
+        config = {'seed': 0, 'mix': [{'name': 'template', 'weight': 1, 'templates': True}]}
+        with mock.patch.object(bench.webservice, 'get_template_names', return_value=[]):
+            with self.assertRaises(SystemExit):
+                bench._plan('http://localhost:9999/biotestmine', config, 10)
@@ -0,0 +1,133 @@
+import unittest
+import json
+import os
+import stat
+import tempfile
+import threading
+import urllib.request
+import urllib.error
+from pathlib import Path
+from http.server import ThreadingHTTPServer
+import click
+from intermine_boot import cli, daemon
+
+class TestDaemon(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        data_home = Path(self.tmpdir.name)
+        (data_home / 'intermine_boot' / 'data' / 'mine' / 'intermine').mkdir(parents=True)
+        (data_home / 'intermine_boot' / 'data' / 'mine' / 'intermine' / 'biotestmine.properties').touch()
+        trash_dir = data_home / 'intermine_boot_workspaces' / '.intermine_boot-trash-old-0'
+        (trash_dir / 'data' / 'mine' / 'intermine').mkdir(parents=True)
+        (trash_dir / 'data' / 'mine' / 'intermine' / 'oldmine.properties').touch()
+
+        options = {'mode': 'daemon', 'source': None, 'workspace': None, 'rebuild': False}
+        env = {'data_home': data_home, 'data_dir': data_home / 'intermine_boot', 'cwd': data_home}
+        self.daemon = daemon.Daemon(options, env)
+
+        daemon._Handler.daemon = self.daemon
+        daemon._Handler.token = daemon._write_token(env)
+        self.headers = {'Authorization': 'Bearer ' + daemon._read_token(env)}
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), daemon._Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = 'http://127.0.0.1:%d' % self.server.server_address[1]
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmpdir.cleanup()
+
+    def _get(self, path, headers=None):
+        request = urllib.request.Request(self.url + path, headers=headers or self.headers)
+        with urllib.request.urlopen(request) as response:
+            return json.load(response)
+
+    def _post(self, path, body, content_type='application/json'):
+        request = urllib.request.Request(
+            self.url + path, data=json.dumps(body).encode('utf-8'),
+            headers=dict(self.headers, **{'Content-Type': content_type}))
+        with urllib.request.urlopen(request) as response:
+            return json.load(response)
+
+    def _assert_rejected(self, code, func, *args, **kwargs):
+        with self.assertRaises(urllib.error.HTTPError) as context:
+            func(*args, **kwargs)
+        self.assertEqual(context.exception.code, code)
+
+    def test_token_file_is_private(self):
+        token_file = daemon._get_token_file(self.daemon.env)
+
+        self.assertEqual(stat.S_IMODE(os.stat(token_file).st_mode), 0o600)
+        self.assertEqual(stat.S_IMODE(os.stat(token_file.parent).st_mode), 0o700)
+
+    def test_requires_token(self):
+        self._assert_rejected(401, self._get, '/mines', headers={'Authorization': 'Bearer wrong'})
+
+    def test_rejects_origin(self):
+        self._assert_rejected(403, self._get, '/mines',
+                              headers=dict(self.headers, Origin='http://example.com'))
+
+    def test_trigger_requires_json(self):
+        self._assert_rejected(415, self._post, '/build/trigger', {'mode': 'build'}, content_type='text/plain')
+
+    def test_trigger_rejects_unsafe_options(self):
+        self._assert_rejected(400, self._post, '/build/trigger',
+                              {'mode': 'build', 'build_im': True, 'im_repo': 'https://example.com/intermine'})
+        self._assert_rejected(400, self._post, '/build/trigger', {'mode': 'build', 'source': 1})
+
+    def test_is_running(self):
+        port = self.server.server_address[1]
+
+        self.assertTrue(daemon.is_running({'daemon_port': port}))
+        self.server.shutdown()
+        self.server.server_close()
+        self.assertFalse(daemon.is_running({'daemon_port': port}))
+
+    def test_local_options(self):
+        options = {param.name: param.default for param in cli.params}
+        options.update({'mode': 'build', 'target': 'local', 'rebuild': True, 'requests': 10})
+
+        with click.Context(cli):
+            self.assertEqual(daemon.get_local_options(options), [])
+            options.update({'build_images': True, 'im_branch': 'master'})
+            self.assertEqual(daemon.get_local_options(options), ['im_branch', 'build_images'])
+
+    def test_status_before_any_build(self):
+        self.assertEqual(self._get('/build/status'), {'buildStatus': 'not_yet_started'})
+
+    def test_mines(self):
+        self.assertEqual(self._get('/mines'), [{
+            'mineName': 'biotestmine',
+            'minelocation': 'http://localhost:9999/biotestmine'
+        }])
+
+    def test_trigger_rejects_invalid_values(self):
+        self._assert_rejected(400, self._post, '/build/trigger', {'mode': 'build', 'cwd': None})
+        self._assert_rejected(400, self._post, '/build/trigger', {'mode': 'build', 'workspace': '../escape'})
+
+    def test_logs_rejects_invalid_offset(self):
+        job_id = self._post('/build/trigger', {'mode': 'start'})['mineId']
+
+        self._assert_rejected(400, self._get, '/build/logs?mineId=' + job_id + '&offset=abc')
+
+    def test_trigger_rejects_other_modes(self):
+        self._assert_rejected(400, self._post, '/build/trigger', {'mode': 'clean'})
+
+    def test_trigger_queues_build(self):
+        job_id = self._post('/build/trigger', {'mode': 'build', 'rebuild': True})['mineId']
+
+        job = self.daemon.get_job(job_id)
+        self.assertEqual(job.options['mode'], 'build')
+        self.assertTrue(job.options['rebuild'])
+        self.assertEqual(self._get('/build/status?mineId=' + job_id), {'buildStatus': 'not_yet_started'})
+
+    def test_logs(self):
+        job_id = self._post('/build/trigger', {'mode': 'start'})['mineId']
+        job = self.daemon.get_job(job_id)
+        job.append_log('Starting containers...\n')
+        job.set_status('complete')
+
+        request = urllib.request.Request(self.url + '/build/logs?mineId=' + job_id, headers=self.headers)
+        with urllib.request.urlopen(request) as response:
+            self.assertEqual(response.read().decode('utf-8'), 'Starting containers...\n')
@@ -0,0 +1,56 @@
+import unittest
+import os
+import tempfile
+from pathlib import Path
+from intermine_boot import depcache
+
+class TestDepCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.env = {'cache_dir': Path(self.tmpdir.name)}
+        depcache.prepare(self.env)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _add_artifact(self, version, size, last_used):
+        version_dir = (depcache.get_cache_dir(self.env) / 'm2' / 'repository' /
+                       'org' / 'intermine' / 'intermine-api' / version)
+        version_dir.mkdir(parents=True)
+        for name in ['intermine-api-' + version + '.pom', 'intermine-api-' + version + '.jar']:
+            path = version_dir / name
+            path.write_bytes(b'\0' * (size // 2))
+            os.utime(path, (last_used, last_used))
+        return version_dir
+
+    def test_prune_evicts_least_recently_used(self):
+        old = self._add_artifact('4.0.0', 1024 * 1024, 1000)
+        new = self._add_artifact('4.1.0', 1024 * 1024, 2000)
+
+        freed = depcache.prune(self.env, 1)
+
+        self.assertEqual(freed, 1024 * 1024)
+        self.assertFalse(old.exists())
+        self.assertTrue(new.exists())
+
+    def test_prune_within_limit(self):
+        artifact = self._add_artifact('4.0.0', 1024, 1000)
+
+        self.assertEqual(depcache.prune(self.env, 1), 0)
+        self.assertTrue(artifact.exists())
+
+    def test_offline(self):
+        self.env['data_dir'] = Path(self.tmpdir.name)
+        offline_script = self.env['data_dir'] / depcache.OFFLINE_INIT_SCRIPT
+        shared_script = (depcache.get_cache_dir(self.env) / 'gradle' /
+                         'init.d' / depcache.OFFLINE_INIT_SCRIPT)
+
+        volumes = depcache.get_volumes({'offline': True}, self.env)
+        self.assertTrue(offline_script.exists())
+        self.assertEqual(volumes[offline_script]['bind'],
+                         '/home/intermine/.gradle/init.d/' + depcache.OFFLINE_INIT_SCRIPT)
+        self.assertFalse(shared_script.exists())
+
+        volumes = depcache.get_volumes({'offline': False}, self.env)
+        self.assertNotIn(offline_script, volumes)
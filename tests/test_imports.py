@@ -0,0 +1,56 @@
+import unittest
+import subprocess
+import sys
+import os
+import tempfile
+
+HEAVY_MODULES = ['docker', 'git', 'yaml', 'boto3', 'botocore', 'pkg_resources']
+
+# Runs the CLI in-process and prints which heavy modules ended up imported.
+SCRIPT = '''
+import sys
+import os
+import tempfile
+from intermine_boot import cli
+try:
+    cli(sys.argv[1:])
+except SystemExit:
+    pass
+print("imported:" + ",".join(m for m in %r if m in sys.modules))
+''' % HEAVY_MODULES
+
+class TestImports(unittest.TestCase):
+
+    def setUp(self):
+        # Keep commands away from the real data and dependency cache.
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.env = dict(os.environ, XDG_DATA_HOME=self.tmpdir.name,
+                        XDG_CACHE_HOME=self.tmpdir.name)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _imported_heavy_modules(self, *args):
+        result = subprocess.run([sys.executable, '-c', SCRIPT] + list(args),
+                                stdout=subprocess.PIPE,
+                                stderr=subprocess.PIPE,
+                                env=self.env,
+                                check=True)
+        last_line = result.stdout.decode('utf-8').strip().splitlines()[-1]
+        return [module for module in last_line[len('imported:'):].split(',') if module]
+
+    def test_import(self):
+        result = subprocess.run(
+            [sys.executable, '-c', 'import sys, intermine_boot; print(",".join(m for m in %r if m in sys.modules))' % HEAVY_MODULES],
+            stdout=subprocess.PIPE, env=self.env, check=True)
+
+        self.assertEqual(result.stdout.decode('utf-8').strip(), '')
+
+    def test_version(self):
+        self.assertEqual(self._imported_heavy_modules('--version'), [])
+
+    def test_help(self):
+        self.assertEqual(self._imported_heavy_modules('--help'), [])
+
+    def test_clean(self):
+        self.assertEqual(self._imported_heavy_modules('clean', 'local'), [])
@@ -0,0 +1,87 @@
+import unittest
+import errno
+import os
+import tempfile
+import time
+from pathlib import Path
+from unittest import mock
+from intermine_boot import trash
+
+class TestTrash(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.parent = Path(self.tmpdir.name)
+        self.data_dir = self.parent / 'intermine_boot'
+        (self.data_dir / 'data' / 'postgres' / 'base').mkdir(parents=True)
+        for i in range(100):
+            (self.data_dir / 'data' / 'postgres' / 'base' / str(i)).write_text('heap')
+        os.symlink(self.data_dir / 'data' / 'postgres', self.data_dir / 'data' / 'link')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _wait_for_empty(self):
+        for _ in range(100):
+            if not list(self.parent.iterdir()):
+                return
+            time.sleep(0.1)
+        self.fail('Trash was not deleted: ' + str(list(self.parent.iterdir())))
+
+    def test_delete_tree(self):
+        trash.delete_tree(self.data_dir)
+
+        self.assertFalse(self.data_dir.exists())
+
+    def test_remove(self):
+        trash.remove(self.data_dir)
+
+        self.assertFalse(self.data_dir.exists())
+        self._wait_for_empty()
+
+    def test_remove_falls_back_to_delete_tree(self):
+        with mock.patch.object(trash.os, 'rename', side_effect=OSError(errno.EXDEV, 'Invalid cross-device link')):
+            trash.remove(self.data_dir)
+
+        self.assertFalse(self.data_dir.exists())
+        self.assertEqual(list(self.parent.iterdir()), [])
+
+    def test_remove_orphans(self):
+        orphan = self.parent / (trash.TRASH_PREFIX + 'intermine_boot-0')
+        os.rename(self.data_dir, orphan)
+
+        trash.remove_orphans([self.parent, self.parent / 'missing'])
+
+        self._wait_for_empty()
+
+    def test_remove_orphans_skips_failed_trash(self):
+        orphan = self.parent / (trash.TRASH_PREFIX + 'intermine_boot-0')
+        os.rename(self.data_dir, orphan)
+        trash._get_failed_file(orphan).touch()
+        stale_pid_file = self.parent / (trash.TRASH_PREFIX + 'intermine_boot-1.pid')
+        stale_pid_file.write_text('1')
+
+        trash.remove_orphans([self.parent])
+
+        self.assertTrue(orphan.is_dir())
+        self.assertFalse(trash._get_pid_file(orphan).exists())
+        self.assertFalse(stale_pid_file.exists())
+
+    def test_remove_writes_pid_file(self):
+        trash.remove(self.data_dir)
+
+        # The deleter may already be done, in which case it removed both.
+        for trash_path in self.parent.glob(trash.TRASH_PREFIX + '*'):
+            if trash_path.suffix != '.pid':
+                self.assertTrue(trash._get_pid_file(trash_path).exists() or not trash_path.exists())
+        self._wait_for_empty()
+
+    def test_remove_into_trash_dir(self):
+        component = self.data_dir / 'data' / 'postgres'
+
+        trash.remove(component, trash_dir=self.parent)
+
+        self.assertFalse(component.exists())
+        self.assertEqual(list((self.data_dir / 'data').glob(trash.TRASH_PREFIX + '*')), [])
+        trash.delete_tree(self.data_dir)
+        self._wait_for_empty()
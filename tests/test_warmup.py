@@ -0,0 +1,66 @@
+import unittest
+from unittest import mock
+from intermine_boot import warmup
+
+MINE_URL = 'http://localhost:9999/biotestmine'
+
+class TestWarmup(unittest.TestCase):
+
+    def test_get_queries(self):
+        config = {
+            'templates': 2,
+            'queries': [
+                '/service/version',
+                {'path': '/service/query/results', 'data': {'format': 'json'}}
+            ]
+        }
+        templates = ['Gene_Protein', 'Gene_GO', 'Gene_Pathway']
+
+        with mock.patch.object(warmup.webservice, 'get_template_names', return_value=templates):
+            queries = warmup._get_queries(MINE_URL, config)
+
+        self.assertEqual(queries, [
+            ('/service/version', None),
+            ('/service/query/results', {'format': 'json'}),
+            (warmup.webservice.get_template_path('Gene_Protein'), None),
+            (warmup.webservice.get_template_path('Gene_GO'), None)
+        ])
+
+    def test_get_queries_without_templates(self):
+        config = {'templates': 0, 'queries': ['/service/version']}
+
+        with mock.patch.object(warmup.webservice, 'get_template_names') as get_template_names:
+            queries = warmup._get_queries(MINE_URL, config)
+
+        self.assertEqual(queries, [('/service/version', None)])
+        get_template_names.assert_not_called()
+
+    def _prewarm(self, tables, output='', success=True):
+        with mock.patch.object(warmup.intermine_docker, 'run_psql',
+                               return_value=(success, output)) as run_psql, \
+                mock.patch.object(warmup.click, 'echo') as echo:
+            warmup._prewarm_postgres({}, {}, tables)
+        return (run_psql.call_args[0][2], echo.call_args[0][0])
+
+    def test_prewarm_hot_tables(self):
+        (sql, _) = self._prewarm(True)
+
+        self.assertTrue(sql.startswith('CREATE EXTENSION IF NOT EXISTS pg_prewarm; '))
+        self.assertIn('FROM pg_stat_user_tables', sql)
+        self.assertIn('LIMIT %d' % warmup.HOT_TABLES_LIMIT, sql)
+
+    def test_prewarm_listed_tables(self):
+        (sql, _) = self._prewarm(['gene', "o'brien"])
+
+        self.assertIn("SELECT 'gene', pg_prewarm('gene') UNION ALL "
+                      "SELECT 'o''brien', pg_prewarm('o''brien')", sql)
+
+    def test_prewarm_counts_blocks(self):
+        (_, message) = self._prewarm(['gene', 'protein'], output='gene|120\nprotein|30\nWARNING: notice\n')
+
+        self.assertEqual(message, 'Loaded 150 Postgres blocks into shared buffers')
+
+    def test_prewarm_failure(self):
+        (_, message) = self._prewarm(True, output='ERROR: could not open extension', success=False)
+
+        self.assertEqual(message, 'pg_prewarm failed: ERROR: could not open extension')
@@ -0,0 +1,28 @@
+import unittest
+from intermine_boot import webservice
+
+class TestWebservice(unittest.TestCase):
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+
+        self.assertEqual(webservice.percentile(values, 50), 50)
+        self.assertEqual(webservice.percentile(values, 95), 95)
+        self.assertEqual(webservice.percentile(values, 99), 99)
+        self.assertEqual(webservice.percentile([7], 99), 7)
+        self.assertIsNone(webservice.percentile([], 50))
+
+    def test_summarize(self):
+        summary = webservice.summarize([0.1, 0.2, 0.3, 0.4])
+
+        self.assertEqual(summary, {'count': 4, 'p50': 200.0, 'p95': 400.0, 'p99': 400.0, 'max': 400.0})
+
+    def test_unreachable(self):
+        (status, _, body) = webservice.request('http://127.0.0.1:9/biotestmine/service/version', timeout=1)
+
+        self.assertIsNone(status)
+        self.assertEqual(body, b'')
+
+    def test_template_path(self):
+        self.assertEqual(webservice.get_template_path('Gene_Protein', size=5),
+                         '/service/template/results?name=Gene_Protein&format=json&size=5')
@@ -0,0 +1,43 @@
+import unittest
+import os
+import tempfile
+from pathlib import Path
+from intermine_boot import workspace
+
+class TestWorkspace(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.src = Path(self.tmpdir.name) / 'src'
+        (self.src / 'data' / 'solr' / 'biotestmine' / 'data' / 'index').mkdir(parents=True)
+        (self.src / 'data' / 'postgres' / 'base').mkdir(parents=True)
+        (self.src / 'data' / 'solr' / 'biotestmine' / 'data' / 'index' / '_0.cfs').write_text('segment')
+        (self.src / 'data' / 'postgres' / 'base' / '16384').write_text('heap')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_default_data_dir(self):
+        data_home = Path(self.tmpdir.name)
+        self.assertEqual(workspace.get_data_dir(data_home), data_home / 'intermine_boot')
+        self.assertEqual(workspace.get_data_dir(data_home, 'experiment'),
+                         data_home / workspace.WORKSPACES_DIR / 'experiment')
+
+    def test_hardlink_clone_only_shares_write_once_files(self):
+        dst = Path(self.tmpdir.name) / 'dst'
+
+        workspace._clone_hardlink(self.src, dst)
+
+        segment = dst / 'data' / 'solr' / 'biotestmine' / 'data' / 'index' / '_0.cfs'
+        heap = dst / 'data' / 'postgres' / 'base' / '16384'
+        self.assertEqual(os.stat(segment).st_nlink, 2)
+        self.assertEqual(os.stat(heap).st_nlink, 1)
+        self.assertEqual(heap.read_text(), 'heap')
+
+    def test_clone(self):
+        dst = Path(self.tmpdir.name) / 'workspaces' / 'dst'
+
+        method = workspace.clone(self.src, dst)
+
+        self.assertIn(method, [name for (name, _) in workspace.CLONE_METHODS])
+        self.assertEqual((dst / 'data' / 'postgres' / 'base' / '16384').read_text(), 'heap')